@@ -0,0 +1,287 @@
+"""
+Coordinates several TempCleaner hosts that clean the same shared storage.
+
+Each of a job's paths is split into shards (one per top-level directory, plus one
+for all top-level files). A host only scans and cleans the shards it holds a lease
+on. Leases are small files on the shared volume, created with O_EXCL so that only
+one host can claim a shard, and carry an expiry time so that shards held by a host
+that died are reclaimed by the others. While a host works on a shard, a heartbeat
+thread renews its lease, so a shard that takes longer than the TTL to scan or clean
+is not taken over by another host.
+"""
+import contextlib
+import dataclasses
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from . import filesystem
+from .filters.age import parse_duration
+
+DEFAULT_LEASE_TTL = "15m"
+DEFAULT_LEASE_DIR_NAME = ".tempcleaner-leases"
+
+# Shard key used for the group of all non-directory entries directly under a path.
+FILES_SHARD_KEY = ""
+
+
+@dataclasses.dataclass
+class Shard:
+    """A unit of work: a group of top-level entries under one of a job's paths."""
+    key: str
+    base_path: Path
+    entries: List[str]
+
+    def __str__(self) -> str:
+        return str(self.base_path / self.key) if self.key else f"{self.base_path} (top-level files)"
+
+
+def split_into_shards(base_path: Path, excludes: Sequence[Path] = ()) -> List[Shard]:
+    """
+    Splits a path into shards: one per top-level directory, and a single shard
+    for all of the top-level files.
+
+    Args:
+        base_path: The absolute path to split.
+        excludes: Top-level paths to leave out of every shard (e.g., the lease directory).
+
+    Returns:
+        A list of shards, sorted by key.
+    """
+    shards = []
+    files = []
+    for entry in filesystem.list_entries(base_path):
+        if Path(entry.path) in excludes:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            shards.append(Shard(key=entry.name, base_path=base_path, entries=[entry.name]))
+        else:
+            files.append(entry.name)
+
+    if files:
+        shards.insert(0, Shard(key=FILES_SHARD_KEY, base_path=base_path, entries=files))
+    return shards
+
+
+class LeaseCoordinator:
+    """Claims shards of a job through lease files on a shared volume."""
+
+    def __init__(self, job_name: str, args: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            job_name: The name of the job the leases belong to.
+            args: The job's 'coordination' config, e.g. {'lease_ttl': '15m', 'lease_dir': '/mnt/scratch/.leases'}.
+
+        Raises:
+            ValueError: If the configuration is invalid.
+        """
+        args = args or {}
+        if not isinstance(args, dict):
+            raise ValueError(f"Coordination config for job '{job_name}' must be a mapping.")
+
+        self.job_name = job_name
+        self.ttl = parse_duration(str(args.get('lease_ttl', DEFAULT_LEASE_TTL))).total_seconds()
+        if self.ttl <= 0:
+            raise ValueError("Coordination 'lease_ttl' must be greater than zero.")
+
+        lease_dir = args.get('lease_dir')
+        self.lease_dir = filesystem.resolve_path(lease_dir) if lease_dir else None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._renewed_at: Dict[Path, float] = {}
+
+    def shards(self, base_path: Path, excludes: Sequence[Path] = ()) -> List[Shard]:
+        """Returns the shards of one of the job's paths, without the lease directory."""
+        return split_into_shards(base_path, excludes=[*excludes, self.lease_dir_for(base_path)])
+
+    def claim(self, shard: Shard) -> bool:
+        """
+        Tries to take the lease on a shard.
+
+        Returns:
+            True if this host now holds the lease, False if another host holds it
+            (or finished the shard less than one lease TTL ago).
+        """
+        lease_path = self._lease_path(shard)
+        lease_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if _create_exclusive(lease_path):
+            self._write_lease(lease_path, 'active')
+            return True
+
+        # The lease exists: it can only be taken over once it has expired. The guard
+        # makes sure that only one host at a time inspects and rewrites it.
+        with self._guard(lease_path) as acquired:
+            if not acquired:
+                return False
+            lease = _read_lease(lease_path)
+            if lease is None or not self._is_expired(lease_path, lease):
+                return False
+            if lease.get('state') != 'done':
+                print(f"Reclaiming expired lease on shard '{shard}' (was held by {lease.get('owner', 'unknown')}).")
+            self._write_lease(lease_path, 'active')
+            return True
+
+    def keep_alive(self, shard: Shard) -> bool:
+        """
+        Renews the lease on a shard if a third of its TTL has passed since the last renewal.
+
+        Returns:
+            False if the lease was lost to another host, True otherwise.
+        """
+        lease_path = self._lease_path(shard)
+        if time.time() - self._renewed_at.get(lease_path, 0) < self.ttl / 3:
+            return True
+
+        with self._guard(lease_path) as acquired:
+            if not acquired:
+                # Someone is inspecting the lease; try again on the next call.
+                return True
+            lease = _read_lease(lease_path)
+            if not lease or lease.get('owner') != self.owner:
+                return False
+            self._write_lease(lease_path, 'active')
+            return True
+
+    def heartbeat(self, shard: Shard) -> 'LeaseHeartbeat':
+        """Returns a heartbeat that keeps the lease on a claimed shard alive while it is used as a context manager."""
+        return LeaseHeartbeat(self, shard)
+
+    def release(self, shard: Shard):
+        """
+        Marks a shard as done. The lease is kept until it expires so that the other
+        hosts do not clean the same shard again in this round.
+        """
+        lease_path = self._lease_path(shard)
+        with self._guard(lease_path) as acquired:
+            lease = _read_lease(lease_path) if acquired else None
+            if lease and lease.get('owner') == self.owner:
+                self._write_lease(lease_path, 'done')
+        self._renewed_at.pop(lease_path, None)
+
+    def abandon(self, shard: Shard):
+        """
+        Gives up the lease on a shard that could not be finished, so that another host
+        can clean it right away. If the lease cannot be removed, it expires as active.
+        """
+        lease_path = self._lease_path(shard)
+        with self._guard(lease_path) as acquired:
+            lease = _read_lease(lease_path) if acquired else None
+            if lease and lease.get('owner') == self.owner:
+                _remove(lease_path)
+        self._renewed_at.pop(lease_path, None)
+
+    def lease_dir_for(self, base_path: Path) -> Path:
+        """The directory holding the leases of the shards of one of the job's paths."""
+        return self.lease_dir or base_path / DEFAULT_LEASE_DIR_NAME
+
+    def _lease_path(self, shard: Shard) -> Path:
+        shard_id = f"{self.job_name}\0{shard.base_path}\0{shard.key}".encode('utf-8')
+        digest = hashlib.sha1(shard_id).hexdigest()[:20]
+        return self.lease_dir_for(shard.base_path) / f"{filesystem.safe_file_name(self.job_name)}-{digest}.lease"
+
+    def _is_expired(self, lease_path: Path, lease: Dict[str, Any]) -> bool:
+        expires = lease.get('expires')
+        if expires is None:
+            # The holder crashed between creating and writing the lease: age it by mtime.
+            try:
+                expires = lease_path.stat().st_mtime + self.ttl
+            except FileNotFoundError:
+                return True
+        return time.time() >= expires
+
+    def _write_lease(self, lease_path: Path, state: str):
+        now = time.time()
+        payload = {'owner': self.owner, 'state': state, 'expires': now + self.ttl}
+        tmp_path = lease_path.with_name(f"{lease_path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_text(json.dumps(payload), encoding='utf-8')
+        os.replace(tmp_path, lease_path)
+        self._renewed_at[lease_path] = now
+
+    @contextlib.contextmanager
+    def _guard(self, lease_path: Path):
+        """Exclusive, short-lived lock around reading and rewriting an existing lease."""
+        guard_path = lease_path.with_name(lease_path.name + '.guard')
+        acquired = _create_exclusive(guard_path)
+        if not acquired:
+            self._break_stale_guard(guard_path)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _remove(guard_path)
+
+    def _break_stale_guard(self, guard_path: Path):
+        # A guard is only held for a few milliseconds; one older than a TTL was left by a crashed host.
+        try:
+            if time.time() - guard_path.stat().st_mtime > self.ttl:
+                _remove(guard_path)
+        except FileNotFoundError:
+            pass
+
+
+class LeaseHeartbeat:
+    """
+    Renews the lease on a shard from a background thread for as long as the shard is
+    worked on, including while it is scanned and during long actions.
+
+    Check `lost` between steps: it is set once the lease has been taken over by another host.
+    """
+
+    def __init__(self, coordinator: LeaseCoordinator, shard: Shard):
+        self.lost = False
+        self._coordinator = coordinator
+        self._shard = shard
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-heartbeat:{shard}", daemon=True)
+
+    def __enter__(self) -> 'LeaseHeartbeat':
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        # Wake up more often than the lease is renewed, so that a renewal skipped
+        # because another host held the guard is retried well before the lease expires.
+        while not self._stop.wait(self._coordinator.ttl / 6):
+            if not self._coordinator.keep_alive(self._shard):
+                self.lost = True
+                return
+
+
+def _create_exclusive(path: Path) -> bool:
+    """Atomically creates an empty file. Returns False if it already exists."""
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    os.close(fd)
+    return True
+
+
+def _read_lease(lease_path: Path) -> Optional[Dict[str, Any]]:
+    """Reads a lease file. Returns None if it does not exist, {} if it is still empty."""
+    try:
+        text = lease_path.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return {}
+
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
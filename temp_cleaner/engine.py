@@ -2,14 +2,19 @@
 The core engine that loads configuration, runs jobs, applies filters,
 and executes actions.
 """
+import os
+import collections
 import yaml
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Optional
 from datetime import datetime
 
 from . import models
 from . import filesystem
 from . import registry
+from . import coordination
+from . import journal
+from . import planner
 
 def load_config(config_path: Path) -> models.Config:
     """Loads, parses, and transforms the YAML configuration into structured objects."""
@@ -39,13 +44,19 @@ def load_config(config_path: Path) -> models.Config:
         raw_triggers = details.get('triggers', [])
         triggers = [registry.create_trigger(t) for t in raw_triggers]
 
+        # Optional multi-host coordination through lease files on shared storage
+        coordinator = None
+        if 'coordination' in details:
+            coordinator = coordination.LeaseCoordinator(name, details['coordination'])
+
         job = models.Job(
             name=name,
             paths=details.get('paths', []),
             patterns=patterns,
             filters=filters,
             actions=actions,
-            triggers=triggers
+            triggers=triggers,
+            coordination=coordinator
         )
         job_list.append(job)
     
@@ -55,19 +66,29 @@ def load_config(config_path: Path) -> models.Config:
 class CleaningEngine:
     """The main engine to execute cleaning jobs using strategy objects."""
 
-    def __init__(self, config: models.Config, dry_run: bool = False):
+    def __init__(self, config: models.Config, dry_run: bool = False, state_dir: Optional[Path] = None):
+        """
+        Args:
+            config: The loaded configuration.
+            dry_run: If True, simulates the actions without making changes.
+            state_dir: Where to keep the run journals and job locks. If None, runs
+                are neither journaled nor locked.
+        """
         self.config = config
         self.dry_run = dry_run
+        self.state_dir = state_dir
+        # Compile every job up front, so that invalid jobs fail before anything runs.
+        self.plans = [planner.compile_job(job) for job in config.jobs]
         print(f"Engine initialized. Dry run: {'Enabled' if dry_run else 'Disabled'}")
 
     def run_jobs(self):
         """Executes all jobs defined in the configuration."""
-        if not self.config.jobs:
+        if not self.plans:
             print("No jobs found in configuration. Nothing to do.")
             return
 
-        print(f"Found {len(self.config.jobs)} job(s) to process.")
-        for job in self.config.jobs:
+        print(f"Found {len(self.plans)} job(s) to process.")
+        for job in self.plans:
             self._run_single_job(job)
 
     def run_scheduled_jobs(self):
@@ -86,6 +107,52 @@ class CleaningEngine:
         print("Checking for shutdown jobs...")
         self._run_jobs_if_triggered(lambda trigger: trigger == "on_shutdown")
 
+    def explain_jobs(self, sample_size: int = planner.DEFAULT_SAMPLE_SIZE):
+        """Prints the execution plan of every job and an estimate of how much work it is."""
+        if not self.plans:
+            print("No jobs found in configuration. Nothing to explain.")
+            return
+
+        for job in self.plans:
+            self._explain_single_job(job, sample_size)
+
+    def _explain_single_job(self, job: planner.JobPlan, sample_size: int):
+        """Prints the plan of one job, followed by a sampled estimate of its scan cost."""
+        print(f"\n--- Plan for Job: {job.name} ---")
+        print("Roots:")
+        for root in job.roots:
+            print(f"  {root}" + ("" if root.is_dir() else " (missing)"))
+        for root in job.pruned_roots:
+            print(f"  {root} (pruned: covered by another root)")
+        print(f"Patterns: {', '.join(job.patterns) or '(none)'}")
+        print(f"Filters: {', '.join(repr(f) for f in job.filters) or '(none)'}")
+        print(f"Actions: {', '.join(type(a).__name__ for a in job.actions) or '(none)'}")
+        print(f"Triggers: {', '.join(str(t) for t in job.triggers) or '(none)'}")
+        if job.coordination:
+            lease_dir = job.coordination.lease_dir or f"<path>/{coordination.DEFAULT_LEASE_DIR_NAME}"
+            print(f"Coordination: leases in {lease_dir}, TTL {int(job.coordination.ttl)}s")
+
+        if not job.patterns:
+            print("Warning: The job has no pattern filter. It will not match any files.")
+            return
+        if not job.actions:
+            print("Warning: The job has no actions. Matching files will be left untouched.")
+
+        recursive = job.walks_roots_recursively
+        print(f"Estimated cost (sampling up to {sample_size} entries per root, "
+              f"{'roots walked recursively' if recursive else 'only the directories the patterns reach'}):")
+        for estimate in planner.estimate_cost(job, sample_size):
+            if estimate.complete:
+                print(f"  {estimate.root}: {estimate.entries_seen} entries")
+                continue
+            print(f"  {estimate.root}: at least ~{estimate.estimated_entries} entries "
+                  f"({estimate.entries_seen} sampled, {estimate.dirs_unexplored} directories not fully sampled)")
+            if recursive:
+                print(f"  Warning: '{estimate.root}' is larger than the sample and is walked recursively. "
+                      "Consider narrower paths or patterns.")
+        if recursive and any(root.parent == root or root == Path.home() for root in job.roots):
+            print("  Warning: The job walks a filesystem root or home directory recursively.")
+
     def _run_jobs_if_triggered(self, trigger_condition_func):
         """
         Generic internal method to run jobs if any of their triggers meet a condition.
@@ -93,11 +160,11 @@ class CleaningEngine:
         Args:
             trigger_condition_func: A function that takes a trigger and returns True or False.
         """
-        if not self.config.jobs:
+        if not self.plans:
             print("No jobs found in configuration.")
             return
 
-        for job in self.config.jobs:
+        for job in self.plans:
             for trigger in job.triggers:
                 if trigger_condition_func(trigger):
                     print(f"Trigger '{trigger}' activated for job '{job.name}'.")
@@ -105,52 +172,181 @@ class CleaningEngine:
                     # A job should only run once per invocation.
                     break
     
-    def _run_single_job(self, job: models.Job):
+    def _run_single_job(self, job: planner.JobPlan):
         """Runs one specific cleaning job."""
         print(f"\n--- Running Job: {job.name} ---")
 
-        # 1. Find all files based on paths and the primary pattern filter.
-        initial_files = self._find_initial_files(job)
-        if not initial_files:
-            print("No files found matching path/pattern criteria.")
-            return
+        # Time-based filters bind their thresholds to the time the run starts, not to load
+        # time. The plan is left untouched: the run uses the predicates the filters return.
+        now = datetime.now()
+        predicates = [f.prepare(now) for f in job.filters]
+
+        if job.coordination and self.dry_run:
+            # Claiming leases in a dry run would keep the other hosts from cleaning.
+            print("Dry run: lease coordination skipped, previewing all shards.")
 
-        # 2. Apply all secondary filters (strategy objects).
-        files_to_clean = self._apply_secondary_filters(initial_files, job.filters)
+        if not job.patterns:
+            print(f"Warning: Job '{job.name}' has no pattern filter. It will not match any files.")
+            return
 
-        if not files_to_clean:
-            print("All initial files were filtered out. Nothing to clean.")
+        # Dry runs go through the same shard by shard code as real runs, so that they
+        # preview what a real run does, but without a journal or lease claims.
+        if self.dry_run or not self.state_dir:
+            self._clean_shards(job, predicates, None)
+            print(f"--- Job {job.name} Finished ---")
             return
 
-        # 3. Execute actions on the filtered files.
-        print(f"Found {len(files_to_clean)} item(s) to clean:")
+        self._run_journaled_job(job, predicates)
+
+    def _run_journaled_job(self, job: planner.JobPlan, predicates: List[Callable[[Path], bool]]):
+        """
+        Runs a job shard by shard (one shard per top-level directory of each path),
+        journaling the run so that it can be resumed if it is interrupted. A lock keeps
+        other processes from running the same job.
+        """
+        with journal.JobLock(self.state_dir, job.name) as locked:
+            if not locked:
+                print(f"Job '{job.name}' is already running in another process. Skipping.")
+                return
+
+            run_journal = journal.RunJournal(self.state_dir, job)
+            if run_journal.resumed:
+                print(f"Resuming the interrupted run of job '{job.name}' from its journal.")
+            try:
+                self._clean_shards(job, predicates, run_journal)
+                run_journal.finish()
+            finally:
+                run_journal.close()
+
+        print(f"--- Job {job.name} Finished ---")
+
+    def _clean_shards(self, job: planner.JobPlan, predicates: List[Callable[[Path], bool]],
+                      run_journal: Optional[journal.RunJournal]):
+        """
+        Cleans every shard of a job that is not finished yet and, with coordination,
+        not leased by another host. Each path is split into one shard per top-level directory.
+        """
+        # Leases are only claimed for real runs; a dry run still leaves the lease directory out.
+        coordinator = None if self.dry_run else job.coordination
+        cleaned, leased, resumed = 0, 0, 0
+
+        for base_path in job.roots:
+            # The run's own state and leases must never be cleaned, wherever they live in the tree.
+            excludes = [Path(os.path.abspath(self.state_dir))] if self.state_dir else []
+            if job.coordination:
+                excludes.append(Path(os.path.abspath(job.coordination.lease_dir_for(base_path))))
+            shards = coordination.split_into_shards(base_path, excludes)
+
+            for shard in shards:
+                if run_journal and run_journal.is_done(shard):
+                    resumed += 1
+                    continue
+                if coordinator and not coordinator.claim(shard):
+                    leased += 1
+                    continue
+                cleaned += 1
+                if not coordinator:
+                    self._clean_shard(job, shard, predicates, run_journal, excludes)
+                    continue
+                try:
+                    with coordinator.heartbeat(shard) as lease:
+                        self._clean_shard(job, shard, predicates, run_journal, excludes, lease)
+                except BaseException:
+                    # Only a finished shard is marked done; a failed one is left to the other hosts.
+                    coordinator.abandon(shard)
+                    raise
+                coordinator.release(shard)
+
+        summary = f"Cleaned {cleaned} shard(s)"
+        if resumed:
+            summary += f", {resumed} already finished by the interrupted run"
+        if coordinator:
+            summary += f", {leased} leased by other hosts"
+        print(summary + ".")
+
+    def _clean_shard(self, job: planner.JobPlan, shard: coordination.Shard,
+                     predicates: List[Callable[[Path], bool]], run_journal: Optional[journal.RunJournal],
+                     excludes: List[Path], lease: Optional[coordination.LeaseHeartbeat] = None):
+        """
+        Finds, filters and cleans the files of a single shard, leaving out `excludes`,
+        what they contain and the directories containing them. With a lease, the shard
+        is abandoned as soon as the lease is lost to another host.
+        """
+        pending = run_journal.pending(shard) if run_journal else None
+        if pending is None:
+            files_to_clean = self._scan_shard(job, shard, predicates, run_journal, excludes, lease)
+            if files_to_clean is None:
+                print(f"Lost the lease on shard '{shard}' to another host. Stopping this shard.")
+                return
+        else:
+            # Replay only the actions that did not complete, without rescanning the shard.
+            # The files are filtered again since they may have changed in the meantime.
+            print(f"Shard '{shard}': replaying {len(pending)} pending item(s) from the journal.")
+            existing = [path for path in pending if os.path.lexists(path)]
+            files_to_clean = self._apply_secondary_filters(existing, predicates)
+
+        if files_to_clean:
+            print(f"Shard '{shard}': {len(files_to_clean)} item(s) to clean:")
         for file_path in files_to_clean:
+            if lease and lease.lost:
+                print(f"Lost the lease on shard '{shard}' to another host. Stopping this shard.")
+                return
             self._execute_actions(file_path, job.actions)
-        
-        print(f"--- Job {job.name} Finished ---")
+            if run_journal:
+                run_journal.record_action(file_path)
 
-    def _find_initial_files(self, job: models.Job) -> List[Path]:
-        """Finds files based on `paths` and the primary `pattern` filters."""
-        if not job.patterns:
-            print(f"Warning: Job '{job.name}' has no pattern filter. It will not match any files.")
-            return []
-        
-        all_files = set()
-        for path_str in job.paths:
-            base_path = filesystem.resolve_path(path_str)
-            for pattern in job.patterns:
-                print(f"Scanning in '{base_path}' for pattern '{pattern}'...")
-                found = filesystem.find_files(base_path, pattern)
-                all_files.update(found)
-        
-        return list(all_files)
+        if run_journal:
+            run_journal.record_shard_done(shard)
+
+    def _scan_shard(self, job: planner.JobPlan, shard: coordination.Shard,
+                    predicates: List[Callable[[Path], bool]], run_journal: Optional[journal.RunJournal],
+                    excludes: List[Path], lease: Optional[coordination.LeaseHeartbeat]) -> Optional[List[Path]]:
+        """
+        Scans a shard one directory at a time and returns the files to clean, or None if
+        the lease was lost. With a journal, every step is recorded, and the interrupted
+        scan of the shard (if any) is resumed from its frontier.
+        """
+        progress = run_journal.scan_progress(shard) if run_journal else None
+        if progress is None:
+            frontier = [filesystem.ScanItem(str(shard.base_path / entry_name), pattern, entry=True)
+                        for entry_name in shard.entries for pattern in job.patterns]
+            if run_journal:
+                run_journal.record_scan_started(shard, frontier)
+            candidates = {}
+        else:
+            frontier, found = progress
+            print(f"Shard '{shard}': resuming the interrupted scan, {len(frontier)} step(s) left.")
+            # The files found before the interruption are filtered again since they may have changed.
+            existing = [path for path in found if os.path.lexists(path)]
+            candidates = dict.fromkeys(self._apply_secondary_filters(existing, predicates))
+
+        queue = collections.deque(frontier)
+        while queue:
+            if lease and lease.lost:
+                return None
+            item = queue.popleft()
+            found, children = filesystem.scan_step(item)
+            # Directories that contain an excluded one are left out too, since cleaning them would remove it.
+            found = [path for path in found
+                     if not any(path == d or d in path.parents or path in d.parents for d in excludes)]
+            children = [child for child in children
+                        if not any(d == Path(child.path) or d in Path(child.path).parents for d in excludes)]
+            found = self._apply_secondary_filters(found, predicates)
+            if run_journal:
+                run_journal.record_scan_step(shard, item, found, children)
+            candidates.update(dict.fromkeys(found))
+            queue.extend(children)
+
+        if run_journal:
+            run_journal.record_scan_done(shard)
+        return list(candidates)
 
-    def _apply_secondary_filters(self, files: List[Path], filters: List[models.Filter]) -> List[Path]:
-        """Applies a list of filter objects to a list of files."""
+    def _apply_secondary_filters(self, files: List[Path], predicates: List[Callable[[Path], bool]]) -> List[Path]:
+        """Applies the predicates returned by the filters' `prepare` to a list of files."""
         filtered_files = files
-        for f in filters:
-            # The engine doesn't know what kind of filter it is, it just calls `matches`.
-            filtered_files = [path for path in filtered_files if f.matches(path)]
+        for matches in predicates:
+            # The engine doesn't know what kind of filter it is, it just calls the predicate.
+            filtered_files = [path for path in filtered_files if matches(path)]
         return filtered_files
 
     def _execute_actions(self, file_path: Path, actions: List[models.Action]):
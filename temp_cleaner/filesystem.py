@@ -3,9 +3,12 @@ Encapsulates all filesystem-related operations, such as path resolving,
 finding files, and performing actions like delete or trash.
 """
 import os
+import re
 import glob
+import fnmatch
+import collections
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Set, Tuple
 
 import send2trash
 
@@ -26,6 +29,11 @@ def resolve_path(path_str: str) -> Path:
     return Path(expanded_path).resolve()
 
 
+def safe_file_name(name: str) -> str:
+    """Replaces every character that is not safe in a file name on all platforms with '_'."""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+
 def find_files(base_path: Path, pattern: str) -> List[Path]:
     """
     Finds all files and directories matching a glob pattern within a base path.
@@ -43,12 +51,249 @@ def find_files(base_path: Path, pattern: str) -> List[Path]:
     # Use recursive glob search
     # The pattern should be relative to the base_path, but glob works by joining them.
     # The '/**/' syntax is crucial for recursive searching.
-    search_pattern = str(base_path / pattern)
+    # os.path.join (unlike the '/' operator of Path) keeps a trailing separator,
+    # which tells glob to only match directories.
+    search_pattern = os.path.join(str(base_path), pattern)
     
     # glob.glob with recursive=True will handle '**' correctly.
     return [Path(p) for p in glob.glob(search_pattern, recursive=True)]
 
 
+def list_entries(base_path: Path) -> List[os.DirEntry]:
+    """
+    Lists the top-level entries (files and directories) of a base path.
+
+    Args:
+        base_path: The absolute path to list.
+
+    Returns:
+        A list of directory entries, sorted by name. Empty if the path is not a directory.
+    """
+    if not base_path.is_dir():
+        return []
+    with os.scandir(base_path) as it:
+        return sorted(it, key=lambda entry: entry.name)
+
+
+class ScanItem(NamedTuple):
+    """
+    One step of a scan: the rest of a pattern to match inside the directory `path`, or,
+    for a top-level entry of a job's path (`entry`), against `path` itself.
+    """
+    path: str
+    pattern: str
+    entry: bool = False
+
+
+def find_files_in_entry(base_path: Path, entry_name: str, pattern: str) -> List[Path]:
+    """
+    Finds the matches of a glob pattern (relative to `base_path`) that live in a
+    single top-level entry of `base_path`.
+
+    Running this for every top-level entry yields the same results as
+    `find_files(base_path, pattern)`, but lets each entry be scanned independently.
+
+    Args:
+        base_path: The absolute path the pattern is relative to.
+        entry_name: The name of a top-level entry of `base_path`.
+        pattern: The glob pattern to match (e.g., '*.log', '**/*.tmp').
+
+    Returns:
+        A list of Path objects for all matches inside (or equal to) the entry.
+    """
+    matches = set()
+    items = [ScanItem(str(base_path / entry_name), pattern, entry=True)]
+    while items:
+        found, children = scan_step(items.pop())
+        matches.update(found)
+        items.extend(children)
+    return list(matches)
+
+
+def scan_step(item: ScanItem) -> Tuple[List[Path], List[ScanItem]]:
+    """
+    Runs one step of a scan. A '**' is walked one directory per step, so that a scan
+    of a large tree can be interrupted and resumed between steps; patterns without
+    '**' are matched with a single glob.
+
+    Args:
+        item: The step to run.
+
+    Returns:
+        A tuple (matches, steps left to run below the item's path).
+    """
+    pattern = item.pattern.replace('\\', '/')
+    parts = [part for part in pattern.split('/') if part]
+    if item.entry:
+        matches, jobs = _match_entry(Path(item.path), parts)
+    else:
+        matches, jobs = _match_dir(item.path, parts)
+
+    if pattern.endswith('/'):
+        # Like glob, a trailing separator only matches directories.
+        matches = {m for m in matches if os.path.isdir(m)}
+    suffix = '/' if pattern.endswith('/') else ''
+    return [Path(m) for m in matches], [ScanItem(path, '/'.join(rest) + suffix) for path, rest in jobs]
+
+
+def _match_entry(entry_path: Path, parts: List[str]) -> Tuple[Set[str], List[Tuple[str, List[str]]]]:
+    """
+    Matches the pattern components in `parts` against a top-level entry. Returns the
+    matches and the (directory, components) pairs left to match inside it.
+    """
+    if not parts:
+        return set(), []
+
+    head, rest = parts[0], parts[1:]
+    # glob never lets a wildcard match a hidden name unless the pattern itself starts with '.'.
+    hidden = entry_path.name.startswith('.')
+    matches, jobs = set(), []
+
+    if head == '**':
+        # '**' either descends into the entry, or matches zero directories
+        # so the remaining components apply to the entry itself.
+        if not hidden and entry_path.is_dir():
+            jobs.append((str(entry_path), parts))
+        if not rest and not hidden:
+            # A trailing '**' matches every entry, files included.
+            matches.add(str(entry_path))
+        rest_matches, rest_jobs = _match_entry(entry_path, rest)
+        return matches | rest_matches, jobs + rest_jobs
+
+    if hidden and glob.has_magic(head) and not head.startswith('.'):
+        return matches, jobs
+    if not fnmatch.fnmatch(entry_path.name, head):
+        return matches, jobs
+
+    if not rest:
+        matches.add(str(entry_path))
+    elif entry_path.is_dir():
+        jobs.append((str(entry_path), rest))
+    elif rest == ['**'] and not glob.has_magic(head):
+        matches.add(str(entry_path))  # glob matches 'file/**' with the file itself.
+    return matches, jobs
+
+
+def _match_dir(dir_path: str, parts: List[str]) -> Tuple[Set[str], List[Tuple[str, List[str]]]]:
+    """
+    Matches the pattern components in `parts` inside a directory, like
+    `glob.glob(os.path.join(dir_path, *parts), recursive=True)` but listing at most one
+    directory for a '**'. Returns the matches and the (directory, components) pairs left.
+    """
+    if '**' not in parts:
+        return set(glob.glob(os.path.join(glob.escape(dir_path), *parts))), []
+
+    index = parts.index('**')
+    if index > 0:
+        # Resolve the components before the '**'; the '**' continues in every directory they match.
+        matches, jobs = set(), []
+        for path in glob.glob(os.path.join(glob.escape(dir_path), *parts[:index])):
+            if os.path.isdir(path):
+                jobs.append((path, parts[index:]))
+            elif index == len(parts) - 1 and not glob.has_magic(parts[index - 1]):
+                matches.add(path)  # glob matches 'file/**' with the file itself.
+        return matches, jobs
+
+    rest = parts[1:]
+    matches, jobs = set(), []
+    if rest:
+        # '**' also matches zero directories.
+        jobs.append((dir_path, rest))
+    else:
+        matches.add(dir_path)
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                # '**' does not descend into hidden directories.
+                if entry.name.startswith('.'):
+                    continue
+                if not rest:
+                    matches.add(entry.path)
+                if entry.is_dir():
+                    jobs.append((entry.path, parts))
+    except OSError:
+        pass
+    return matches, jobs
+
+
+def sample_tree(base_path: Path, patterns: Sequence[str], budget: int) -> Tuple[int, int, int]:
+    """
+    Walks the directories that a scan of `base_path` for `patterns` lists, breadth-first,
+    until `budget` entries have been seen, to estimate how much work the scan is.
+
+    Like the scan, the walk lists `base_path` itself, steps through the literal components
+    of a pattern without listing the directories on the way, lists the directories whose
+    entries a wildcard is matched against, and walks the whole subtree below a '**'. It
+    does not descend into hidden directories (unless a pattern names them) or follow symlinks.
+
+    Args:
+        base_path: The absolute path to walk.
+        patterns: The glob patterns of the scan (e.g., '*.log', 'build/**').
+        budget: The maximum number of entries to look at.
+
+    Returns:
+        A tuple (entries seen, directories listed, directories left unexplored or only partly listed).
+    """
+    if not base_path.is_dir():
+        return 0, 0, 0
+
+    # The entries of every directory listed so far, so that a directory several patterns reach is only counted once.
+    listings = {}
+    seen = 0
+    # Each item is a directory and the pattern components left to match inside it.
+    queue = collections.deque((base_path, tuple(p for p in pattern.replace('\\', '/').split('/') if p))
+                              for pattern in patterns)
+    queue.appendleft((base_path, ()))  # The scan always lists the top-level entries.
+    queued = set(queue)
+
+    while queue:
+        dir_path, parts = queue.popleft()
+        head, rest = (parts[0], parts[1:]) if parts else (None, ())
+        children = []
+        if head is not None and not glob.has_magic(head) and head != '**':
+            # A literal component is looked up directly; its parent is not listed.
+            children = [(dir_path / head, rest)] if rest and (dir_path / head).is_dir() else []
+        else:
+            if dir_path not in listings:
+                entries = []
+                try:
+                    with os.scandir(dir_path) as it:
+                        for entry in it:
+                            if seen >= budget:
+                                # The directory is only partly listed, so it counts as unexplored.
+                                queue.append((dir_path, parts))
+                                return seen, len(listings), _count_unlisted(queue, listings)
+                            seen += 1
+                            entries.append((entry.name, entry.is_dir(follow_symlinks=False)))
+                except OSError:
+                    pass
+                listings[dir_path] = entries
+            if head == '**' and rest:
+                # '**' also matches zero directories, so the rest of the pattern applies here too.
+                children.append((dir_path, rest))
+            for name, is_dir in listings[dir_path]:
+                if not is_dir or head is None:
+                    continue
+                if head == '**':
+                    if not name.startswith('.'):
+                        children.append((dir_path / name, parts))
+                elif rest and fnmatch.fnmatch(name, head) and (head.startswith('.') or not name.startswith('.')):
+                    children.append((dir_path / name, rest))
+
+        for child in children:
+            if child not in queued:
+                queued.add(child)
+                queue.append(child)
+        if seen >= budget:
+            break
+    return seen, len(listings), _count_unlisted(queue, listings)
+
+
+def _count_unlisted(queue: Iterable[Tuple[Path, Tuple[str, ...]]], listings: Dict[Path, list]) -> int:
+    """Counts the distinct directories in the queue of `sample_tree` that were not listed."""
+    return len({dir_path for dir_path, _ in queue} - listings.keys())
+
+
 def trash_item(path: Path, dry_run: bool = False):
     """
     Moves a file or directory to the system's trash.
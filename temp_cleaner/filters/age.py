@@ -3,16 +3,27 @@ Filter for files based on their age (last modification time).
 """
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Callable, Dict
 
 from .base import Filter
 
-def _parse_duration(duration_str: str) -> timedelta:
+def parse_duration(duration_str: str) -> timedelta:
     """
     Parses a duration string (e.g., "30d", "2h", "5m") into a timedelta object.
+
+    Raises:
+        ValueError: If the string is not a non-negative number followed by a unit.
     """
+    if not isinstance(duration_str, str) or len(duration_str.strip()) < 2:
+        raise ValueError(f"Invalid duration: {duration_str!r}. Expected a number and a unit, e.g. '30d'.")
+    duration_str = duration_str.strip()
     unit = duration_str[-1].lower()
-    value = int(duration_str[:-1])
+    try:
+        value = int(duration_str[:-1])
+    except ValueError:
+        raise ValueError(f"Invalid duration: {duration_str!r}. Expected a number and a unit, e.g. '30d'.")
+    if value < 0:
+        raise ValueError(f"Invalid duration: {duration_str!r}. It must not be negative.")
     if unit == 'd':
         return timedelta(days=value)
     if unit == 'h':
@@ -34,17 +45,28 @@ class AgeFilter(Filter):
         else:
             raise ValueError("AgeFilter requires 'older_than' parameter.")
         
-        self.delta = _parse_duration(duration_str)
-        self.threshold_timestamp = datetime.now() - self.delta
+        self.duration_str = duration_str
+        self.delta = parse_duration(duration_str)
+
+    def prepare(self, now: datetime) -> Callable[[Path], bool]:
+        """Returns a predicate whose age threshold is relative to the time the run starts."""
+        threshold = (now - self.delta).timestamp()
+        return lambda file_path: self._matches_threshold(file_path, threshold)
 
     def matches(self, file_path: Path) -> bool:
         """
-        Checks if a file's age matches the filter criteria.
+        Checks if a file's age matches the filter criteria, relative to the current time.
         """
+        return self.prepare(datetime.now())(file_path)
+
+    def _matches_threshold(self, file_path: Path, threshold: float) -> bool:
         try:
             file_mod_time = file_path.stat().st_mtime
             if self.mode == 'older_than':
-                return file_mod_time < self.threshold_timestamp.timestamp()
+                return file_mod_time < threshold
         except FileNotFoundError:
             return False
-        return False
\ No newline at end of file
+        return False
+
+    def __repr__(self) -> str:
+        return f"AgeFilter({self.mode}='{self.duration_str}')"
\ No newline at end of file
@@ -2,11 +2,27 @@
 Defines the abstract base class for all Filter strategies.
 """
 import abc
+from datetime import datetime
 from pathlib import Path
+from typing import Callable
 
 class Filter(abc.ABC):
     """Abstract base class for all secondary filters."""
 
+    def prepare(self, now: datetime) -> Callable[[Path], bool]:
+        """
+        Called once at the start of every run to get the predicate the run matches files with.
+        Filters that depend on the current time bind their thresholds to `now` here,
+        without changing the filter itself.
+
+        Args:
+            now: The time the run starts.
+
+        Returns:
+            A function that takes a file path and returns True if it matches.
+        """
+        return self.matches
+
     @abc.abstractmethod
     def matches(self, file_path: Path) -> bool:
         """
@@ -13,6 +13,8 @@ class SizeFilter(Filter):
         if 'greater_than' in args:
             self.mode = 'greater_than'
             self.limit_size = args['greater_than']
+            if isinstance(self.limit_size, bool) or not isinstance(self.limit_size, (int, float)) or self.limit_size < 0:
+                raise ValueError(f"SizeFilter 'greater_than' must be a non-negative number of bytes, got {self.limit_size!r}.")
         else:
             raise ValueError("SizeFilter requires 'greater_than' parameter.")
         
@@ -26,4 +28,7 @@ class SizeFilter(Filter):
                 return self.limit_size < file_size
         except FileNotFoundError:
             return False
-        return False
\ No newline at end of file
+        return False
+
+    def __repr__(self) -> str:
+        return f"SizeFilter({self.mode}={self.limit_size})"
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""
+Keeps an append-only journal per job so that an interrupted run can be resumed.
+
+The journal records, for every shard of the job, the progress of its scan (the
+directories left to visit, the directories already visited and the candidate files
+found in them), when the scan is complete, and each file whose actions have completed.
+When a run is killed before it finishes, the next run skips the shards that were
+already finished, resumes an interrupted scan from its frontier without visiting the
+same directories again, and only replays the pending actions of a scanned shard.
+
+Lists of paths are written in chunks of `RECORD_CHUNK_SIZE`, so that no record grows
+with the size of the tree.
+
+A lock file per job keeps two overlapping invocations from running the same job.
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from . import filesystem
+from . import planner
+from .coordination import Shard
+from .filesystem import ScanItem
+
+# Every record is flushed to the OS right away, so it survives the process being
+# killed; fsync (which also survives a power loss) is batched.
+FSYNC_EVERY_RECORDS = 100
+FSYNC_INTERVAL_SECONDS = 1.0
+
+# The maximum number of paths in a single record.
+RECORD_CHUNK_SIZE = 1000
+
+
+class JobLock:
+    """
+    An exclusive, non-blocking lock on a job, held for the duration of a `with` block.
+
+    The lock is taken with flock (or msvcrt on Windows), so it is released by the OS
+    even when the process is killed.
+    """
+
+    def __init__(self, state_dir: Path, job_name: str):
+        self.path = state_dir / f"{job_file_stem(job_name)}.lock"
+        self._file = None
+        self.locked = False
+
+    def __enter__(self) -> bool:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a+')
+        try:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+            self.locked = True
+        except OSError:
+            self.locked = False
+        return self.locked
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.locked:
+            if fcntl:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self.locked = False
+        self._file.close()
+        return False
+
+
+class RunJournal:
+    """The journal of a single job run, resumed from disk if the previous run was interrupted."""
+
+    def __init__(self, state_dir: Path, job: planner.JobPlan):
+        """
+        Opens the journal of a job. If it holds an unfinished run of the same job
+        configuration, that run is resumed; otherwise a new run is started.
+
+        Args:
+            state_dir: The directory holding the journals.
+            job: The job being run.
+        """
+        self.path = state_dir / f"{job_file_stem(job.name)}.journal"
+        self.fingerprint = _fingerprint(job)
+
+        self._done_shards: Set[Tuple[str, str]] = set()
+        self._scanned_shards: Set[Tuple[str, str]] = set()
+        self._queued: Dict[Tuple[str, str], Dict[ScanItem, None]] = {}
+        self._visited: Dict[Tuple[str, str], Set[ScanItem]] = {}
+        self._found: Dict[Tuple[str, str], Dict[str, None]] = {}
+        self._completed: Set[str] = set()
+        self._unsynced = 0
+        self._synced_at = time.time()
+        self.resumed = self._load()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.resumed:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._append({'op': 'begin', 'fingerprint': self.fingerprint, 'started': time.time()})
+            self.sync()
+
+    def is_done(self, shard: Shard) -> bool:
+        """Whether the shard was finished by the interrupted run."""
+        return _shard_id(shard) in self._done_shards
+
+    def pending(self, shard: Shard) -> Optional[List[Path]]:
+        """
+        Returns the candidates of a shard whose actions have not completed yet,
+        or None if the shard's scan did not complete.
+        """
+        shard_id = _shard_id(shard)
+        if shard_id not in self._scanned_shards:
+            return None
+        return [Path(p) for p in self._found.get(shard_id, {}) if p not in self._completed]
+
+    def scan_progress(self, shard: Shard) -> Optional[Tuple[List[ScanItem], List[Path]]]:
+        """
+        Returns the progress of the interrupted scan of a shard: the steps left to run
+        and the candidates found so far. None if the scan never started.
+        """
+        shard_id = _shard_id(shard)
+        if shard_id not in self._queued:
+            return None
+        visited = self._visited.get(shard_id, set())
+        frontier = [item for item in self._queued[shard_id] if item not in visited]
+        return frontier, [Path(p) for p in self._found.get(shard_id, {})]
+
+    def record_scan_started(self, shard: Shard, items: List[ScanItem]):
+        """Records the first steps of a shard's scan."""
+        self._append_chunked(shard, 'queued', 'items', items)
+
+    def record_scan_step(self, shard: Shard, item: ScanItem, candidates: List[Path], children: List[ScanItem]):
+        """Records a step of a shard's scan: the candidates it found and the steps it left to run below it."""
+        self._append_chunked(shard, 'found', 'files', [str(f) for f in candidates])
+        self._append_chunked(shard, 'queued', 'items', children)
+        self._append({'op': 'visited', 'shard': list(_shard_id(shard)), 'item': item})
+
+    def record_scan_done(self, shard: Shard):
+        """Records that a shard's scan is complete, and syncs its candidates before any action runs."""
+        self._append({'op': 'scanned', 'shard': list(_shard_id(shard))})
+        self.sync()
+
+    def record_action(self, file_path: Path):
+        """Records that the actions on a file have completed."""
+        self._append({'op': 'action', 'file': str(file_path)})
+
+    def record_shard_done(self, shard: Shard):
+        """Records that a shard is finished and syncs the journal."""
+        self._append({'op': 'shard_done', 'shard': list(_shard_id(shard))})
+        self.sync()
+
+    def sync(self):
+        """Flushes the pending records and fsyncs the journal."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._synced_at = time.time()
+
+    def finish(self):
+        """Marks the run as complete: the journal is emptied so the next run starts over."""
+        self._file.truncate(0)
+        self.sync()
+
+    def close(self):
+        """Syncs and closes the journal. An unfinished run is kept for the next run to resume."""
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def _append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= FSYNC_EVERY_RECORDS or time.time() - self._synced_at >= FSYNC_INTERVAL_SECONDS:
+            self.sync()
+
+    def _append_chunked(self, shard: Shard, op: str, key: str, values: List[Any]):
+        for start in range(0, len(values), RECORD_CHUNK_SIZE):
+            self._append({'op': op, 'shard': list(_shard_id(shard)), key: values[start:start + RECORD_CHUNK_SIZE]})
+
+    def _load(self) -> bool:
+        """Replays the journal on disk. Returns True if there is a run to resume."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+
+        # The last record may have been torn by the crash. It is cut off, or the next
+        # record would be appended onto the same line and be lost as well.
+        complete = data[:data.rfind(b'\n') + 1]
+        if len(complete) < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(len(complete))
+        lines = complete.decode('utf-8').splitlines()
+        if not lines:
+            return False
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+
+        if not records or records[0].get('op') != 'begin':
+            return False
+        if records[0].get('fingerprint') != self.fingerprint:
+            print("Job configuration changed since the interrupted run. Starting over.")
+            return False
+
+        for record in records[1:]:
+            op = record.get('op')
+            shard_id = tuple(record.get('shard', ()))
+            if op == 'queued':
+                self._queued.setdefault(shard_id, {}).update(dict.fromkeys(ScanItem(*i) for i in record['items']))
+            elif op == 'found':
+                self._found.setdefault(shard_id, {}).update(dict.fromkeys(record['files']))
+            elif op == 'visited':
+                self._visited.setdefault(shard_id, set()).add(ScanItem(*record['item']))
+            elif op == 'scanned':
+                self._scanned_shards.add(shard_id)
+            elif op == 'action':
+                self._completed.add(record['file'])
+            elif op == 'shard_done':
+                self._done_shards.add(shard_id)
+        return True
+
+
+def job_file_stem(job_name: str) -> str:
+    """
+    The base name of a job's lock and journal files. The hash of the raw name keeps jobs
+    whose names only differ in unsafe characters (e.g. 'tmp cache' and 'tmp_cache') apart.
+    """
+    digest = hashlib.sha1(job_name.encode('utf-8')).hexdigest()[:12]
+    return f"{filesystem.safe_file_name(job_name)}-{digest}"
+
+
+def _shard_id(shard: Shard) -> Tuple[str, str]:
+    return (str(shard.base_path), shard.key)
+
+
+def _fingerprint(job: planner.JobPlan) -> str:
+    """
+    Identifies the parts of a job that decide which files are scanned and what is done
+    to them. Filters are left out: pending files are filtered again when replayed.
+    """
+    identity = {
+        'roots': [str(root) for root in job.roots],
+        'patterns': list(job.patterns),
+        'actions': [type(a).__name__ for a in job.actions],
+    }
+    return hashlib.sha1(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
@@ -15,7 +15,7 @@ def main():
     
     parser.add_argument(
         "command",
-        choices=["run", "check-schedule", "on-startup", "on-shutdown"],
+        choices=["run", "check-schedule", "on-startup", "on-shutdown", "explain"],
         help="The command to execute."
     )
     
@@ -31,6 +31,13 @@ def main():
         action="store_true",
         help="Simulate the cleaning process without actually deleting or moving files."
     )
+
+    parser.add_argument(
+        "--state-dir",
+        type=Path,
+        default=Path(".tempcleaner"),
+        help="Directory for run journals and job locks, used to resume interrupted runs (default: .tempcleaner next to the executable)."
+    )
     
     args = parser.parse_args()
     
@@ -52,9 +59,14 @@ def main():
             print(f"Error: Configuration file not found at '{config_path}'")
             return
 
+        # Resolve the state directory the same way
+        state_dir = args.state_dir
+        if not state_dir.is_absolute():
+            state_dir = base_path / state_dir
+
         print(f"Loading configuration from: {config_path}")
         config = load_config(config_path)
-        engine = CleaningEngine(config, dry_run=args.dry_run)
+        engine = CleaningEngine(config, dry_run=args.dry_run, state_dir=state_dir.resolve())
 
         if args.command == "run":
             print("--- Running all jobs manually ---")
@@ -69,6 +81,8 @@ def main():
         elif args.command == "on-shutdown":
             engine.run_shutdown_jobs()
             print("\nShutdown job check completed.")
+        elif args.command == "explain":
+            engine.explain_jobs()
 
     except Exception as e:
         print(f"\nAn error occurred: {e}")
@@ -7,6 +7,7 @@ from typing import List, Dict, Any, Optional
 from .actions import Action
 from .filters import Filter
 from .triggers import Trigger
+from .coordination import LeaseCoordinator
 
 
 @dataclasses.dataclass
@@ -20,6 +21,7 @@ class Job:
     filters: List[Filter]   # List of secondary filter objects (e.g., AgeFilter)
     actions: List[Action]   # List of action objects (e.g., TrashAction)
     triggers: List[Trigger]   # List of trigger objects (e.g., ScheduleTrigger)
+    coordination: Optional[LeaseCoordinator] = None  # Multi-host lease sharding, if enabled
 
 @dataclasses.dataclass
 class Config:
@@ -0,0 +1,187 @@
+"""
+Compiles jobs into validated, immutable execution plans, and estimates how much
+work a plan is.
+
+Compiling a job resolves its paths, normalizes and deduplicates its patterns and
+prunes roots that another root already covers, so that configuration mistakes are
+reported before anything runs rather than in the middle of a run.
+"""
+import dataclasses
+import glob
+from pathlib import Path, PurePosixPath, PureWindowsPath
+from typing import List, Optional, Tuple
+
+from . import filesystem
+from . import models
+from .actions import Action
+from .coordination import LeaseCoordinator
+from .filters import Filter
+from .triggers import Trigger
+
+# Number of directory entries the sampled scan of `explain` looks at per root.
+DEFAULT_SAMPLE_SIZE = 10000
+
+
+@dataclasses.dataclass(frozen=True)
+class JobPlan:
+    """The immutable, validated form of a job that the engine executes."""
+    name: str
+    roots: Tuple[Path, ...]          # Resolved paths to scan, without duplicates or covered roots
+    pruned_roots: Tuple[Path, ...]   # Paths dropped because another root already covers them
+    patterns: Tuple[str, ...]        # Normalized, deduplicated pattern filters
+    filters: Tuple[Filter, ...]
+    actions: Tuple[Action, ...]
+    triggers: Tuple[Trigger, ...]
+    coordination: Optional[LeaseCoordinator] = None
+
+    @property
+    def walks_roots_recursively(self) -> bool:
+        """
+        Whether a scan walks the whole tree below each root, i.e. some pattern has a '**'
+        that only wildcards lead to. 'build/**' only walks the 'build' subtree.
+        """
+        for pattern in self.patterns:
+            parts = pattern.rstrip('/').split('/')
+            if '**' in parts and all(glob.has_magic(part) for part in parts[:parts.index('**')]):
+                return True
+        return False
+
+
+@dataclasses.dataclass(frozen=True)
+class CostEstimate:
+    """The result of a sampled scan of one root."""
+    root: Path
+    entries_seen: int
+    dirs_listed: int
+    dirs_unexplored: int
+
+    @property
+    def complete(self) -> bool:
+        """Whether the sample covered everything the scan would walk."""
+        return self.dirs_unexplored == 0
+
+    @property
+    def estimated_entries(self) -> int:
+        """
+        Entries the scan would walk, extrapolating the unexplored directories from the
+        average directory size. This is a lower bound: their subdirectories are not counted.
+        """
+        if self.complete or not self.dirs_listed:
+            return self.entries_seen
+        return self.entries_seen + self.dirs_unexplored * self.entries_seen // self.dirs_listed
+
+
+def compile_job(job: models.Job) -> JobPlan:
+    """
+    Validates a job and compiles it into an execution plan.
+
+    Args:
+        job: The job loaded from the configuration.
+
+    Returns:
+        The job's execution plan.
+
+    Raises:
+        ValueError: If the job's paths or patterns are invalid.
+    """
+    try:
+        patterns = _normalize_patterns(job.patterns)
+        paths = [job.paths] if isinstance(job.paths, str) else job.paths
+        if not isinstance(paths, list) or not all(isinstance(p, str) and p.strip() for p in paths):
+            raise ValueError(f"'paths' must be a list of non-empty strings, got {job.paths!r}")
+    except ValueError as e:
+        raise ValueError(f"Invalid job '{job.name}': {e}")
+
+    roots, pruned_roots = _prune_roots([filesystem.resolve_path(p) for p in paths], patterns)
+    return JobPlan(
+        name=job.name,
+        roots=tuple(roots),
+        pruned_roots=tuple(pruned_roots),
+        patterns=tuple(patterns),
+        filters=tuple(job.filters),
+        actions=tuple(job.actions),
+        triggers=tuple(job.triggers),
+        coordination=job.coordination,
+    )
+
+
+def estimate_cost(plan: JobPlan, sample_size: int = DEFAULT_SAMPLE_SIZE) -> List[CostEstimate]:
+    """
+    Estimates how many directory entries a run of the plan walks, with a quick
+    sampled scan of each root.
+
+    Args:
+        plan: The plan to estimate.
+        sample_size: The maximum number of entries to look at per root.
+
+    Returns:
+        One estimate per root.
+    """
+    estimates = []
+    for root in plan.roots:
+        seen, listed, unexplored = filesystem.sample_tree(root, plan.patterns, sample_size)
+        estimates.append(CostEstimate(root, seen, listed, unexplored))
+    return estimates
+
+
+def _normalize_patterns(raw_patterns: List[str]) -> List[str]:
+    """Validates, normalizes and deduplicates patterns, keeping their order."""
+    patterns = []
+    for raw in raw_patterns:
+        pattern = _normalize_pattern(raw)
+        if pattern not in patterns:
+            patterns.append(pattern)
+
+    # '*.log' is redundant next to '**/*.log', since '**' also matches zero directories.
+    return [p for p in patterns if f"**/{p}" not in patterns]
+
+
+def _normalize_pattern(raw) -> str:
+    if not isinstance(raw, str) or not raw.strip():
+        raise ValueError(f"Patterns must be non-empty strings, got {raw!r}")
+
+    pattern = raw.strip().replace('\\', '/')
+    if PurePosixPath(pattern).is_absolute() or PureWindowsPath(pattern).drive:
+        raise ValueError(f"Pattern '{raw}' must be relative to the job's paths")
+
+    # A trailing separator restricts glob to directories, so it is kept.
+    dirs_only = pattern.endswith('/')
+    parts = []
+    for part in pattern.split('/'):
+        if part in ('', '.'):
+            continue
+        if part == '..':
+            raise ValueError(f"Pattern '{raw}' must not leave the job's paths ('..')")
+        if part == '**' and parts and parts[-1] == '**':
+            continue
+        parts.append(part)
+
+    if not parts:
+        raise ValueError(f"Pattern '{raw}' does not match anything below the job's paths")
+    return '/'.join(parts) + ('/' if dirs_only else '')
+
+
+def _prune_roots(roots: List[Path], patterns: List[str]) -> Tuple[List[Path], List[Path]]:
+    """
+    Drops duplicate roots and, if every pattern is recursive, roots nested in another
+    root. Returns the kept roots and the dropped ones.
+    """
+    # A pattern starting with '**' matches at any depth, so it covers nested roots too.
+    recursive = bool(patterns) and all(p.split('/')[0] == '**' for p in patterns)
+    kept, pruned = [], []
+    for root in roots:
+        if root in kept or root in pruned:
+            continue
+        if recursive and any(_is_covered(root, other) for other in roots):
+            pruned.append(root)
+            continue
+        kept.append(root)
+    return kept, pruned
+
+
+def _is_covered(root: Path, other: Path) -> bool:
+    """Whether a recursive scan of `other` also reaches everything below `root`."""
+    if other not in root.parents:
+        return False
+    # '**' does not descend into hidden directories.
+    return not any(part.startswith('.') for part in root.relative_to(other).parts)
@@ -64,12 +64,18 @@ def create_filter(filter_config: Dict[str, Any]) -> Filter:
     Returns:
         An instance of a concrete Filter subclass.
     """
+    if not isinstance(filter_config, dict) or len(filter_config) != 1:
+        raise ValueError(f"Invalid filter configuration format: {filter_config}")
+
     filter_type = list(filter_config.keys())[0]
     filter_args = filter_config[filter_type]
 
     FilterClass = FILTER_REGISTRY.get(filter_type)
     if not FilterClass:
         raise ValueError(f"Unknown filter type: {filter_type}")
+
+    if not isinstance(filter_args, dict):
+        raise ValueError(f"Arguments of filter '{filter_type}' must be a mapping, got {filter_args!r}")
     
     # Pass the arguments to the constructor of the filter class.
     return FilterClass(filter_args)
@@ -0,0 +1,161 @@
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from temp_cleaner import coordination, engine, filesystem
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _make_tree(root: Path, shards: int, files_per_shard: int):
+    for i in range(shards):
+        for j in range(files_per_shard):
+            path = root / f"d{i}" / "sub" / f"f{j}.tmp"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('x')
+    (root / 'top.tmp').write_text('x')
+
+
+def test_concurrent_runners_clean_each_file_once(tmp_path: Path):
+    shared = tmp_path / 'shared'
+    _make_tree(shared, shards=20, files_per_shard=3)
+    expected = {str(p) for p in shared.rglob('*.tmp')}
+
+    config = tmp_path / 'config.yaml'
+    config.write_text(
+        "jobs:\n"
+        "  scratch:\n"
+        f"    paths: ['{shared}']\n"
+        "    filters:\n"
+        "      - pattern: '**/*.tmp'\n"
+        "    actions:\n"
+        "      - delete: {}\n"
+        "    coordination:\n"
+        "      lease_ttl: '10m'\n",
+        encoding='utf-8',
+    )
+
+    # Each worker stands in for a host: its own process and its own state directory.
+    workers = [
+        subprocess.Popen(
+            [sys.executable, 'run.py', 'run', '--config', str(config), '--state-dir', str(tmp_path / f'state{n}')],
+            cwd=REPO_ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+        )
+        for n in range(4)
+    ]
+    outputs = [worker.communicate(timeout=60)[0] for worker in workers]
+
+    prefix = 'Deleting permanently: '
+    deleted = [line[len(prefix):] for out in outputs for line in out.splitlines() if line.startswith(prefix)]
+    assert len(deleted) == len(set(deleted)), "a file was acted on by more than one worker"
+    assert set(deleted) == expected
+    assert not list(shared.rglob('*.tmp'))
+
+
+def _shard(tmp_path: Path) -> coordination.Shard:
+    (tmp_path / 'data' / 'd1').mkdir(parents=True)
+    return coordination.split_into_shards(tmp_path / 'data')[0]
+
+
+def test_active_lease_is_exclusive(tmp_path: Path):
+    shard = _shard(tmp_path)
+    first = coordination.LeaseCoordinator('job', {'lease_ttl': '10m'})
+    second = coordination.LeaseCoordinator('job', {'lease_ttl': '10m'})
+
+    assert first.claim(shard)
+    assert not second.claim(shard)
+
+    # A finished shard stays leased until the lease expires.
+    first.release(shard)
+    assert not second.claim(shard)
+
+
+def test_expired_lease_is_reclaimed(tmp_path: Path):
+    shard = _shard(tmp_path)
+    crashed = coordination.LeaseCoordinator('job', {'lease_ttl': '1s'})
+    survivor = coordination.LeaseCoordinator('job', {'lease_ttl': '1s'})
+
+    assert crashed.claim(shard)
+    assert not survivor.claim(shard)
+
+    time.sleep(1.2)
+    assert survivor.claim(shard)
+    # The original holder notices it lost the lease on its next renewal.
+    assert not crashed.keep_alive(shard)
+    assert survivor.keep_alive(shard)
+
+
+def test_lease_dir_is_not_a_shard(tmp_path: Path):
+    data = tmp_path / 'data'
+    (data / 'd1').mkdir(parents=True)
+    coordinator = coordination.LeaseCoordinator('job')
+    assert coordinator.claim(coordinator.shards(data)[0])
+
+    assert [shard.key for shard in coordinator.shards(data)] == ['d1']
+
+
+def test_lease_is_renewed_while_a_shard_is_scanned(tmp_path: Path, monkeypatch):
+    data = tmp_path / 'data'
+    (data / 'd1').mkdir(parents=True)
+    (data / 'd1' / 'f.tmp').write_text('x')
+    config = tmp_path / 'config.yaml'
+    config.write_text(
+        "jobs:\n"
+        "  scratch:\n"
+        f"    paths: ['{data}']\n"
+        "    filters:\n"
+        "      - pattern: '**/*.tmp'\n"
+        "    actions:\n"
+        "      - delete: {}\n"
+        "    coordination:\n"
+        "      lease_ttl: '1s'\n",
+        encoding='utf-8',
+    )
+    other_host = coordination.LeaseCoordinator('scratch', {'lease_ttl': '1s'})
+    scan_step = filesystem.scan_step
+    claimed_by_other_host = []
+
+    def slow_scan(item):
+        # The scan takes several lease TTLs; the other host keeps trying to take the shard over.
+        if not claimed_by_other_host:
+            for _ in range(12):
+                time.sleep(0.25)
+                claimed_by_other_host.append(other_host.claim(other_host.shards(data)[0]))
+        return scan_step(item)
+
+    monkeypatch.setattr(filesystem, 'scan_step', slow_scan)
+    engine.CleaningEngine(engine.load_config(config), state_dir=tmp_path / 'state').run_jobs()
+
+    assert not any(claimed_by_other_host)
+    assert not (data / 'd1' / 'f.tmp').exists()
+
+
+def test_failed_shard_is_not_marked_done(tmp_path: Path, monkeypatch):
+    data = tmp_path / 'data'
+    (data / 'd1').mkdir(parents=True)
+    config = tmp_path / 'config.yaml'
+    config.write_text(
+        "jobs:\n"
+        "  scratch:\n"
+        f"    paths: ['{data}']\n"
+        "    filters:\n"
+        "      - pattern: '**/*.tmp'\n"
+        "    actions:\n"
+        "      - delete: {}\n"
+        "    coordination:\n"
+        "      lease_ttl: '10m'\n",
+        encoding='utf-8',
+    )
+
+    def failing_scan(item):
+        raise PermissionError(item.path)
+
+    monkeypatch.setattr(filesystem, 'scan_step', failing_scan)
+    with pytest.raises(PermissionError):
+        engine.CleaningEngine(engine.load_config(config), state_dir=tmp_path / 'state').run_jobs()
+
+    other_host = coordination.LeaseCoordinator('scratch', {'lease_ttl': '10m'})
+    assert other_host.claim(other_host.shards(data)[0])
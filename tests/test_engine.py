@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from temp_cleaner import engine
+
+
+def _cleaned(output: str, prefix: str):
+    return sorted(line[len(prefix):] for line in output.splitlines() if line.startswith(prefix))
+
+
+def test_dry_run_previews_what_a_real_run_cleans(tmp_path: Path, capsys):
+    data = tmp_path / 'data'
+    for rel in ['a/x.tmp', 'a/b/y.tmp', 'c/z.tmp', 'top.tmp']:
+        path = data / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+    # The state directory lives inside the cleaned tree and must be left alone by both runs.
+    state_dir = data / '.state'
+
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(
+        "jobs:\n"
+        "  everything:\n"
+        f"    paths: ['{data}']\n"
+        "    filters:\n"
+        "      - pattern: ['**/*', '.state/**']\n"
+        "    actions:\n"
+        "      - delete: {}\n"
+        "    coordination: {}\n",
+        encoding='utf-8',
+    )
+    config = engine.load_config(config_path)
+
+    engine.CleaningEngine(config, dry_run=True, state_dir=state_dir).run_jobs()
+    previewed = _cleaned(capsys.readouterr().out, '[DRY-RUN] Deleting permanently: ')
+    assert not (data / '.tempcleaner-leases').exists(), "a dry run must not claim leases"
+
+    engine.CleaningEngine(config, state_dir=state_dir).run_jobs()
+    cleaned = _cleaned(capsys.readouterr().out, 'Deleting permanently: ')
+
+    assert previewed and previewed == cleaned
+    assert not any('.state' in path or '.tempcleaner-leases' in path for path in cleaned)
+
+
+def test_nested_state_and_lease_dirs_are_never_cleaned(tmp_path: Path, capsys):
+    data = tmp_path / 'data'
+    (data / 'var').mkdir(parents=True)
+    (data / 'var' / 'x.tmp').write_text('x')
+    state_dir = data / 'var' / 'state'
+    lease_dir = data / 'var' / 'leases'
+
+    config_path = tmp_path / 'config.yaml'
+    config_path.write_text(
+        "jobs:\n"
+        "  everything:\n"
+        f"    paths: ['{data}']\n"
+        "    filters:\n"
+        "      - pattern: '**/*'\n"
+        "    actions:\n"
+        "      - delete: {}\n"
+        "    coordination:\n"
+        f"      lease_dir: '{lease_dir}'\n",
+        encoding='utf-8',
+    )
+    engine.CleaningEngine(engine.load_config(config_path), state_dir=state_dir).run_jobs()
+    cleaned = _cleaned(capsys.readouterr().out, 'Deleting permanently: ')
+
+    assert cleaned == [str(data / 'var' / 'x.tmp')]
+    assert state_dir.is_dir() and lease_dir.is_dir()
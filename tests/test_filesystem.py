@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pytest
+
+from temp_cleaner import filesystem
+
+PATTERNS = [
+    '*.log', '**/*.log', '**', '**/*', '*/', '**/', '*/*.tmp', 'a/**', 'a/**/b.tmp',
+    '**/build', 'build/**', '**/a/*', '.hidden/*', '**/.hidden', '.*', '*',
+    '*/**/*.tmp', '**/a/**', 'a/**/', 'c[[]1]/**', '*/**', 'b.tmp/**', '**/.hidden/**', 'a/**/build/**/*.log',
+    '*/b.tmp/**', '**/b.tmp/**',
+]
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    for rel in [
+        'x.log', 'b.tmp', '.dot.log',
+        'a/x.log', 'a/b.tmp', 'a/build/x.log', 'a/a/b.tmp',
+        'build/x.log', 'build/deep/b.tmp',
+        '.hidden/x.log', '.hidden/a/b.tmp',
+        'c[1]/x.log', 'c[1]/.hidden/b.tmp',
+    ]:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+    (tmp_path / 'empty').mkdir()
+    return tmp_path
+
+
+@pytest.mark.parametrize('pattern', PATTERNS)
+def test_find_files_in_entry_matches_find_files(tree: Path, pattern: str):
+    expected = set(filesystem.find_files(tree, pattern))
+    expected.discard(tree)  # '**' also matches the base path itself, which belongs to no entry.
+
+    found = set()
+    for entry in filesystem.list_entries(tree):
+        found.update(filesystem.find_files_in_entry(tree, entry.name, pattern))
+
+    assert found == expected
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from temp_cleaner.filters import AgeFilter, SizeFilter
+
+
+def test_age_filter_binds_threshold_to_the_run_without_changing_the_filter(tmp_path: Path):
+    path = tmp_path / 'new.tmp'
+    path.write_text('x')
+    age_filter = AgeFilter({'older_than': '1d'})
+    state = dict(vars(age_filter))
+
+    now = datetime.now()
+    today = age_filter.prepare(now)
+    in_two_days = age_filter.prepare(now + timedelta(days=2))
+
+    assert not today(path)
+    assert in_two_days(path)
+    assert not age_filter.matches(path)
+    assert vars(age_filter) == state
+
+
+@pytest.mark.parametrize('limit', [0, 1024, 1.5e6])
+def test_size_filter_accepts_numbers_of_bytes(limit):
+    assert SizeFilter({'greater_than': limit}).limit_size == limit
+
+
+@pytest.mark.parametrize('limit', ['10MB', -1, True, None])
+def test_size_filter_rejects_invalid_limits(limit):
+    with pytest.raises(ValueError):
+        SizeFilter({'greater_than': limit})
@@ -0,0 +1,176 @@
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from temp_cleaner import coordination, engine, filesystem, journal, models, planner
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs a job and kills the process (no cleanup, no flushing) after `kill_after` deletes.
+KILLED_RUN = textwrap.dedent('''
+    import os, sys
+    from pathlib import Path
+    from temp_cleaner import engine
+    from temp_cleaner.actions import delete
+
+    config_path, state_dir, kill_after = Path(sys.argv[1]), Path(sys.argv[2]), int(sys.argv[3])
+    execute = delete.DeleteAction.execute
+    count = [0]
+
+    def execute_then_die(self, file_path, dry_run=False):
+        if count[0] == kill_after:
+            os._exit(1)
+        count[0] += 1
+        execute(self, file_path, dry_run)
+
+    delete.DeleteAction.execute = execute_then_die
+    engine.CleaningEngine(engine.load_config(config_path), state_dir=state_dir).run_jobs()
+''')
+
+
+def _write_config(tmp_path: Path, data: Path) -> Path:
+    config = tmp_path / 'config.yaml'
+    config.write_text(
+        "jobs:\n"
+        "  big:\n"
+        f"    paths: ['{data}']\n"
+        "    filters:\n"
+        "      - pattern: '**/*.tmp'\n"
+        "    actions:\n"
+        "      - delete: {}\n",
+        encoding='utf-8',
+    )
+    return config
+
+
+def _deleted(output: str):
+    prefix = 'Deleting permanently: '
+    return [line[len(prefix):] for line in output.splitlines() if line.startswith(prefix)]
+
+
+def test_killed_run_resumes_without_repeating_work(tmp_path: Path, capsys):
+    data = tmp_path / 'data'
+    for shard in ('a', 'b', 'c'):
+        for i in range(4):
+            path = data / shard / f"f{i}.tmp"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('x')
+    config = _write_config(tmp_path, data)
+    state_dir = tmp_path / 'state'
+
+    # Killed in the middle of shard 'b'.
+    killed = subprocess.run(
+        [sys.executable, '-c', KILLED_RUN, str(config), str(state_dir), '6'],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    assert killed.returncode == 1
+    first_run = _deleted(killed.stdout)
+    assert len(first_run) == 6
+
+    # Shard 'a' is finished: a file created there now must not be picked up by the resumed run.
+    (data / 'a' / 'late.tmp').write_text('x')
+
+    engine.CleaningEngine(engine.load_config(config), state_dir=state_dir).run_jobs()
+    output = capsys.readouterr().out
+    second_run = _deleted(output)
+
+    assert "replaying 2 pending item(s)" in output
+    assert not set(first_run) & set(second_run)
+    assert len(first_run) + len(second_run) == 12
+    assert [p.name for p in data.rglob('*.tmp')] == ['late.tmp']
+    assert (state_dir / f"{journal.job_file_stem('big')}.journal").read_text() == ''
+
+
+def test_lock_and_journal_are_per_job(tmp_path: Path):
+    assert journal.job_file_stem('tmp cache') != journal.job_file_stem('tmp_cache')
+
+    with journal.JobLock(tmp_path, 'tmp cache') as first:
+        with journal.JobLock(tmp_path, 'tmp_cache') as other_job:
+            with journal.JobLock(tmp_path, 'tmp cache') as same_job:
+                assert first and other_job and not same_job
+
+
+def test_torn_record_does_not_swallow_the_next_one(tmp_path: Path):
+    data = tmp_path / 'data'
+    (data / 'a').mkdir(parents=True)
+    job = planner.compile_job(models.Job(
+        name='big', paths=[str(data)], patterns=['**/*.tmp'], filters=[], actions=[], triggers=[],
+    ))
+    shard = coordination.split_into_shards(data)[0]
+    files = [data / 'a' / f"f{i}.tmp" for i in range(3)]
+
+    item = filesystem.ScanItem(str(data / 'a'), '**/*.tmp', entry=True)
+    first = journal.RunJournal(tmp_path, job)
+    first.record_scan_started(shard, [item])
+    first.record_scan_step(shard, item, files, [])
+    first.record_scan_done(shard)
+    first.close()
+    with open(first.path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "action", "fi')  # Killed in the middle of a write.
+
+    resumed = journal.RunJournal(tmp_path, job)
+    resumed.record_action(files[0])
+    resumed.close()
+
+    assert journal.RunJournal(tmp_path, job).pending(shard) == files[1:]
+
+
+# Runs a job and kills the process after `kill_after` steps of the scan, printing each completed step.
+KILLED_SCAN = textwrap.dedent('''
+    import os, sys
+    from pathlib import Path
+    from temp_cleaner import engine, filesystem, journal
+
+    config_path, state_dir, kill_after = Path(sys.argv[1]), Path(sys.argv[2]), int(sys.argv[3])
+    journal.RECORD_CHUNK_SIZE = 2
+    scan_step = filesystem.scan_step
+    count = [0]
+
+    def scan_step_then_die(item):
+        if count[0] == kill_after:
+            os._exit(1)
+        result = scan_step(item)
+        print('STEP', item.path, item.pattern, flush=True)
+        count[0] += 1
+        return result
+
+    filesystem.scan_step = scan_step_then_die
+    engine.CleaningEngine(engine.load_config(config_path), state_dir=state_dir).run_jobs()
+''')
+
+
+def test_killed_scan_resumes_from_its_frontier(tmp_path: Path, capsys, monkeypatch):
+    # All of the tree is in a single top-level directory, i.e. a single shard.
+    data = tmp_path / 'data'
+    for i in range(8):
+        for j in range(5):
+            path = data / 'big' / f"d{i}" / f"f{j}.tmp"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text('x')
+    config = _write_config(tmp_path, data)
+    state_dir = tmp_path / 'state'
+
+    killed = subprocess.run(
+        [sys.executable, '-c', KILLED_SCAN, str(config), str(state_dir), '8'],
+        cwd=REPO_ROOT, capture_output=True, text=True,
+    )
+    assert killed.returncode == 1
+    first_steps = [line for line in killed.stdout.splitlines() if line.startswith('STEP ')]
+    assert len(first_steps) == 8
+
+    scan_step = filesystem.scan_step
+    second_steps = []
+
+    def recording_scan_step(item):
+        second_steps.append(f"STEP {item.path} {item.pattern}")
+        return scan_step(item)
+
+    monkeypatch.setattr(filesystem, 'scan_step', recording_scan_step)
+    engine.CleaningEngine(engine.load_config(config), state_dir=state_dir).run_jobs()
+    output = capsys.readouterr().out
+
+    assert "resuming the interrupted scan" in output
+    assert not set(first_steps) & set(second_steps)
+    assert len(_deleted(output)) == 40
+    assert not list(data.rglob('*.tmp'))
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+
+from temp_cleaner import filesystem, models, planner
+
+RAW_PATTERNS = [
+    '*/', 'cache/', '**/', '**/cache/', './*.log', 'a//*.tmp', './a/./b.tmp',
+    '**/**/*.tmp', '**/*.log', '*.log', ' *.tmp ', 'a/**/', '**',
+]
+
+
+@pytest.fixture
+def tree(tmp_path: Path) -> Path:
+    for rel in ['x.log', 'b.tmp', 'a/x.log', 'a/b.tmp', 'a/cache/c.tmp', 'cache/x.log', 'cache/d/e.tmp']:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+    return tmp_path
+
+
+def test_trailing_separator_is_kept():
+    assert planner._normalize_patterns(['*/', 'cache/', '**/']) == ['*/', 'cache/', '**/']
+
+
+@pytest.mark.parametrize('raw', RAW_PATTERNS)
+def test_normalized_pattern_matches_the_same_files(tree: Path, raw: str):
+    normalized = planner._normalize_pattern(raw)
+    assert set(filesystem.find_files(tree, normalized)) == set(filesystem.find_files(tree, raw.strip()))
+
+
+@pytest.mark.parametrize('raw', ['../x', 'a/../../x', '/abs/*', 'C:/x/*', '', '   ', '.', './', 5])
+def test_invalid_patterns_are_rejected(raw):
+    with pytest.raises(ValueError):
+        planner._normalize_pattern(raw)
+
+
+def test_redundant_patterns_and_nested_roots_are_pruned(tmp_path: Path):
+    job = models.Job(
+        name='job',
+        paths=[str(tmp_path), str(tmp_path / 'sub'), str(tmp_path / '.hidden'), str(tmp_path)],
+        patterns=['*.log', '**/*.log', './**/*.log'],
+        filters=[], actions=[], triggers=[],
+    )
+    plan = planner.compile_job(job)
+
+    assert plan.patterns == ('**/*.log',)
+    # '**' does not descend into hidden directories, so '.hidden' is not covered.
+    assert plan.roots == (tmp_path, tmp_path / '.hidden')
+    assert plan.pruned_roots == (tmp_path / 'sub',)
+
+
+def _plan(root: Path, patterns) -> planner.JobPlan:
+    return planner.compile_job(models.Job(
+        name='job', paths=[str(root)], patterns=patterns, filters=[], actions=[], triggers=[],
+    ))
+
+
+def test_sample_stops_inside_a_large_directory(tmp_path: Path):
+    for i in range(50):
+        (tmp_path / f"f{i}").touch()
+
+    [estimate] = planner.estimate_cost(_plan(tmp_path, ['**/*']), sample_size=20)
+
+    assert estimate.entries_seen == 20
+    assert not estimate.complete
+
+
+def test_sample_only_walks_what_the_patterns_reach(tmp_path: Path):
+    for rel in ['x.log', 'build/a/b.o', 'build/c.o', 'other/deep/d.o']:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    for i in range(100):
+        (tmp_path / 'other' / f"f{i}").touch()
+
+    plan = _plan(tmp_path, ['build/**', '*.log'])
+    [estimate] = planner.estimate_cost(plan)
+
+    # The top level (x.log, build, other), build (a, c.o) and build/a (b.o); 'other' is never listed.
+    assert (estimate.entries_seen, estimate.dirs_listed, estimate.complete) == (6, 3, True)
+    assert not plan.walks_roots_recursively
+    assert _plan(tmp_path, ['*/**/*.o']).walks_roots_recursively